@@ -3,13 +3,66 @@
 import argparse
 import re
 import datetime
+import time
 import hashlib
 import os
 import fnmatch
 import shutil
+import stat
+import sys
 import tempfile
 import pickle
-from collections import defaultdict
+import threading
+import mmap
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+# Size of the blocks in which files are read for hashing.
+BLOCK_SIZE = 1 << 20
+
+# Number of files for which reads are requested ahead of hashing.
+PREFETCH_DEPTH = 128
+
+# Whole files of at least this size are hashed through a memory map.
+MMAP_THRESHOLD = 1 << 20
+
+# Size strings such as "2.5GB" or "3.2MiB" and the multipliers of their units.
+SIZE_PATTERN = re.compile(r"([0-9.]+)\s*([A-Z]*)")
+SIZE_UNITS = {
+    "": 1,
+    "B": 1,
+    "K": 10**3,
+    "KB": 10**3,
+    "M": 10**6,
+    "MB": 10**6,
+    "G": 10**9,
+    "GB": 10**9,
+    "T": 10**12,
+    "TB": 10**12,
+    "KI": 2**10,
+    "KIB": 2**10,
+    "MI": 2**20,
+    "MIB": 2**20,
+    "GI": 2**30,
+    "GIB": 2**30,
+    "TI": 2**40,
+    "TIB": 2**40,
+}
+
+# Output prefixes of duplicates depending on their "into" mark.
+INTO_MARKS = {True: "↳ ", False: "  "}
+
+# Presets and parameter groups of the --check option and what they stand for.
+CHECK_PRESETS = {
+    "epic": frozenset(["date", "full"]),
+    "full": frozenset(["name", "data"]),
+    "data": frozenset(["size", "bytes", "count", "hash"]),
+    "fast": frozenset(["size", "tree"]),
+    "tree": frozenset(["name", "count"]),
+    "name": frozenset(["dirname", "filename"]),
+    "bytes": frozenset(["firstbytes", "lastbytes"]),
+    "count": frozenset(["dircount", "filecount"]),
+}
 
 
 class Bench:
@@ -31,7 +84,7 @@ class Bench:
         This method does nothing if the Bench object is not enabled.
         """
         if self.enabled:
-            self.bench_times.append(datetime.datetime.now())
+            self.bench_times.append(time.perf_counter_ns())
 
     def stop(self):
         """
@@ -41,10 +94,11 @@ class Bench:
         if not self.enabled or not self.bench_times:
             return
         start_time = self.bench_times.pop()
-        elapsed_time = datetime.datetime.now() - start_time
+        elapsed_ns = time.perf_counter_ns() - start_time
 
-        hours, rem = divmod(elapsed_time.total_seconds(), 3600)
-        minutes, seconds = divmod(rem, 60)
+        hours, rem = divmod(elapsed_ns, 3600 * 10**9)
+        minutes, rem = divmod(rem, 60 * 10**9)
+        seconds = rem / 10**9
 
         if hours > 0:
             print(f"Elapsed time: {hours} hours {minutes} minutes")
@@ -67,6 +121,9 @@ class Cache:
         """
         self.enabled = enable
         self.data = {}
+        self.pending = False
+        self.dirty = False
+        self.lock = threading.Lock()
         if self.enabled:
             self.file = os.path.join(tempfile.gettempdir(), file)
 
@@ -74,15 +131,28 @@ class Cache:
         """
         Load data from cache file to the cache dictionary.
 
+        The file is read lazily on the first access to the cache, so runs that never
+        hash any file contents do not spend time unpickling it.
+
         Returns:
-            bool: True if cache file exists and data is successfully loaded, False otherwise.
+            bool: True if cache file exists and data will be loaded, False otherwise.
         """
         if self.enabled and os.path.isfile(self.file):
-            with open(self.file, "rb") as file:
-                self.data = pickle.load(file)
+            self.pending = True
             return True
         return False
 
+    def load_pending(self):
+        """
+        Read the cache file requested by `load`. Safe to call from several threads,
+        the file is read only once.
+        """
+        with self.lock:
+            if self.pending:
+                with open(self.file, "rb") as file:
+                    self.data = pickle.load(file)
+                self.pending = False
+
     def get(self, key):
         """
         Get a value from the cache.
@@ -93,6 +163,8 @@ class Cache:
         Returns:
             value: The value for the key if key is in the cache, else None.
         """
+        if self.pending:
+            self.load_pending()
         return self.data.get(key, None)
 
     def set(self, key, value):
@@ -103,22 +175,78 @@ class Cache:
             key (str): The key for which to set the value.
             value: The value to set.
         """
+        if self.pending:
+            self.load_pending()
         self.data[key] = value
+        self.dirty = True
+
+    def prune(self, files):
+        """
+        Drop the entries of scanned files that changed since they were cached.
+
+        The keys include the size and the modification time of a file, so the entries
+        of a changed file are never used again. Without pruning they would stay in the
+        cache file forever. The cache is not loaded just to prune it.
+
+        Args:
+            files (dict): The size and the modification time of every scanned file, by node.
+        """
+        if self.pending or not files:
+            return
+        stale = [
+            key
+            for key in self.data
+            if key[0] in files and files[key[0]] != (key[1], key[2])
+        ]
+        for key in stale:
+            del self.data[key]
+        if stale:
+            self.dirty = True
+
+    def reset(self):
+        """
+        Drop all cached data. The cache file is overwritten on the next `save`.
+        """
+        self.data = {}
+        self.pending = False
+        self.dirty = True
 
     def save(self):
         """
         Save the cache dictionary to the cache file.
 
+        The file is only written when the cache has been modified since it was loaded.
+
         Returns:
             bool: True if caching is enabled and data is successfully saved, False otherwise.
         """
         if self.enabled:
-            with open(self.file, "wb") as file:
-                pickle.dump(self.data, file)
+            if not self.dirty:
+                # Nothing was added to the cache, the file is still up to date
+                return True
+
+            # Write to a temporary file first, so an interrupted save never
+            # leaves a truncated cache behind.
+            temp_file = self.file + ".tmp"
+            with open(temp_file, "wb") as file:
+                pickle.dump(self.data, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.file)
+            self.dirty = False
             return True
         return False
 
 
+def log(*args):
+    """
+    Prints a progress message, unless the quiet parameter is set.
+
+    Args:
+        *args: The values to print, as for `print`.
+    """
+    if not params.quiet:
+        print(*args)
+
+
 def parse_size(orig_size_str):
     """
     Parses the size string and converts it to bytes.
@@ -132,36 +260,10 @@ def parse_size(orig_size_str):
     Raises:
     ValueError: If the size string cannot be parsed.
     """
-    size_str = orig_size_str.upper()
-    size_units = {
-        None: 1,
-        "B": 1,
-        "K": 10**3,
-        "KB": 10**3,
-        "M": 10**6,
-        "MB": 10**6,
-        "G": 10**9,
-        "GB": 10**9,
-        "T": 10**12,
-        "TB": 10**12,
-        "KI": 2**10,
-        "KIB": 2**10,
-        "MI": 2**20,
-        "MIB": 2**20,
-        "GI": 2**30,
-        "GIB": 2**30,
-        "TI": 2**40,
-        "TIB": 2**40,
-    }
+    match = SIZE_PATTERN.match(orig_size_str.upper())
 
-    pattern = r"([0-9.]+)\s*([A-Z]*)?"
-    match = re.match(pattern, size_str)
-
-    if match:
-        size = float(match.group(1))
-        unit = match.group(2)
-        if unit in size_units:
-            return int(size * size_units[unit])
+    if match and match.group(2) in SIZE_UNITS:
+        return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
 
     raise ValueError(f"Invalid size format: {orig_size_str}")
 
@@ -214,19 +316,74 @@ def format_date(timestamp):
         raise ValueError("Invalid timestamp") from error
 
 
+def new_hasher(data=b""):
+    """
+    Create the hasher used for all keys and file contents.
+
+    All hashes of the script are made here, so they always use the same algorithm
+    and digest size as the hashes stored in the cache.
+
+    Parameters:
+    data (bytes): The initial data to hash. Default is empty.
+
+    Returns:
+    hashlib.blake2b: A 16-byte blake2b hasher.
+    """
+    return hashlib.blake2b(data, digest_size=16)
+
+
 def get_hash(data):
     """
-    Compute the blake2b hash of the given data.
+    Compute the 16-byte blake2b hash of the given data.
 
     Parameters:
     data (str or bytes): The data to hash.
 
     Returns:
-    str: The hexadecimal representation of the hash.
+    bytes: The raw digest of the hash.
     """
     if isinstance(data, str):
         data = data.encode()
-    return hashlib.blake2b(data).hexdigest()
+    return new_hasher(data).digest()
+
+
+def get_file_window(file_info, offset=None, size=None):
+    """
+    Normalizes the part of a file to read, so that a part covering the whole file
+    is always described the same way and its hash is read and cached only once.
+
+    Args:
+        file_info (dict): A dictionary containing information about the file.
+        offset (int, optional): The starting point from which to read the file,
+                                negative to count from the end. Default is None.
+        size (int, optional): The number of bytes to read from the file. Default is None.
+
+    Returns:
+        tuple: The offset and size to use, (None, None) for the whole file.
+    """
+    file_size = file_info["size"]
+    if offset is None or offset == 0 or (offset < 0 and -offset >= file_size):
+        if size is None or size >= file_size:
+            return None, None
+    return offset, size
+
+
+def get_cache_key(file_info, offset=None, size=None):
+    """
+    Returns the key under which the hash of a file, or of a part of it, is cached.
+
+    Besides the device and inode, the key includes the size and the modification time
+    of the file, so a file changed since it was hashed never gets its old hash.
+
+    Args:
+        file_info (dict): A dictionary containing information about the file.
+        offset (int, optional): The starting point from which the file is read. Default is None.
+        size (int, optional): The number of bytes read from the file. Default is None.
+
+    Returns:
+        tuple: The cache key.
+    """
+    return (file_info["node"], file_info["size"], file_info["mtime"], offset, size)
 
 
 def get_file_hash(file_info, offset=None, size=None):
@@ -243,62 +400,199 @@ def get_file_hash(file_info, offset=None, size=None):
         size (int, optional): The number of bytes to read from the file. Default is None.
 
     Returns:
-        str: The calculated hash of the file (or part of the file if offset and size are given).
+        bytes: The 16-byte digest of the file (or part of the file if offset and size are given).
     """
 
-    # Extract the node value from the file info dictionary.
-    node = file_info["node"]
+    offset, size = get_file_window(file_info, offset, size)
+
+    # Build the cache key from the file info dictionary.
+    cache_key = get_cache_key(file_info, offset, size)
 
     # Try to get the hash value from the cache first.
-    file_hash = cache.get((node, offset, size))
+    file_hash = cache.get(cache_key)
     if file_hash:
         # If the hash value exists in the cache, return it without calculating.
         return file_hash
 
-    # Initialize the hasher.
-    hasher = hashlib.blake2b()
+    hasher = new_hasher()
 
     # Open the file to calculate its hash.
-    with open(file_info["path"], "rb") as file:
-        # If an offset is provided, adjust the file position.
-        if offset is not None:
-            file.seek(offset, 0 if offset >= 0 else 2)
-
-        # If a size is provided, read only the specified number of bytes from the file.
-        if size is not None:
-            bytes_read = 0
-            for block in iter(lambda: file.read(min(size - bytes_read, 65536)), b""):
-                hasher.update(block)
-                bytes_read += len(block)
-                if bytes_read >= size:
+    with open(file_info["path"], "rb", buffering=0) as file:
+        # Large whole files are mapped into memory and passed to the hasher in
+        # a single call instead of being read block by block.
+        mapped = False
+        if offset is None and size is None and file_info["size"] >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if hasattr(data, "madvise"):
+                        data.madvise(mmap.MADV_SEQUENTIAL)
+                    hasher.update(data)
+                mapped = True
+            except (OSError, ValueError):
+                # The file can not be mapped, read it as usual.
+                pass
+
+        if not mapped:
+            # If an offset is provided, adjust the file position.
+            if offset is not None:
+                file.seek(offset, 0 if offset >= 0 else 2)
+            elif size is None and hasattr(os, "posix_fadvise"):
+                # The whole file is read in order, let the kernel read ahead further
+                try:
+                    os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    # Only a hint, some file systems do not support it
+                    pass
+
+            # Reuse one read buffer, so that reading does not allocate a new bytes
+            # object for every block.
+            buffer_size = min(BLOCK_SIZE, file_info["size"] if size is None else size)
+            buffer = memoryview(bytearray(max(buffer_size, 1)))
+
+            # If a size is provided, read only the specified number of bytes from the file,
+            # otherwise read the whole file.
+            remaining = size
+            while remaining is None or remaining > 0:
+                block = buffer if remaining is None else buffer[:remaining]
+                bytes_read = file.readinto(block)
+                if not bytes_read:
                     break
-        else:
-            # If no size is specified, read the whole file.
-            for block in iter(lambda: file.read(65536), b""):
-                hasher.update(block)
+                hasher.update(block[:bytes_read])
+                if remaining is not None:
+                    remaining -= bytes_read
 
-    # Calculate the final hash.
-    file_hash = hasher.hexdigest()
+        # A large file is read whole only once, so drop its pages from the page
+        # cache, that they do not push out the data of the files still to read.
+        if (
+            offset is None
+            and size is None
+            and file_info["size"] >= MMAP_THRESHOLD
+            and hasattr(os, "posix_fadvise")
+        ):
+            try:
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+
+    # Calculate the final hash, kept as the raw digest.
+    file_hash = hasher.digest()
 
     # Store the calculated hash in the cache for future use.
-    cache.set((node, offset, size), file_hash)
+    cache.set(cache_key, file_hash)
 
     return file_hash  # Return the calculated hash.
 
 
-def compact_keys(keys):
+def prefetch_file(file_info, offset=None, size=None):
     """
-    Compacts a large number of keys into a hashed representation.
+    Asks the kernel to start reading a part of a file in the background.
+
+    The function takes the same offset and size parameters as `get_file_hash`. When the hash
+    is not cached yet, it advises the kernel that this range will be needed soon, so reads
+    for many files are queued at once instead of waiting for each file in turn.
+    Does nothing on platforms without `os.posix_fadvise`.
 
     Args:
-        keys (iterable): The input keys to be compacted if necessary.
+        file_info (dict): A dictionary containing information about the file.
+        offset (int, optional): The starting point from which the file will be read. Default is None.
+        size (int, optional): The number of bytes that will be read. Default is None.
+    """
+
+    offset, size = get_file_window(file_info, offset, size)
+
+    if not hasattr(os, "posix_fadvise") or cache.get(
+        get_cache_key(file_info, offset, size)
+    ):
+        return
+
+    # Resolve a negative offset relative to the end of the file.
+    start = offset or 0
+    if start < 0:
+        start = max(file_info["size"] + start, 0)
+
+    try:
+        fd = os.open(file_info["path"], os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.posix_fadvise(fd, start, size or 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def walk_entries(dir_path, followlinks):
+    """
+    Walks a directory tree bottom-up like `os.walk(topdown=False)`, but yields `os.DirEntry`
+    objects instead of names, so callers can use the type and stat information of the entries
+    without joining and resolving the paths again.
+
+    Directories that cannot be read are yielded as empty.
+
+    Args:
+        dir_path (str): The path of the directory to traverse.
+        followlinks (bool): Whether or not to descend into symbolic links to directories.
+
+    Yields:
+        tuple: The directory path, a list of entries for its subdirectories and a list of entries
+        for its other files.
+    """
+    stack = [(dir_path, None, None)]
+
+    while stack:
+        root, dirs, files = stack.pop()
+
+        # The subdirectories have been walked already, the directory itself is next
+        if dirs is not None:
+            yield root, dirs, files
+            continue
+
+        dirs, files, walk_dirs = [], [], []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if not is_dir:
+                        files.append(entry)
+                        continue
+
+                    dirs.append(entry)
+                    try:
+                        if followlinks or not entry.is_symlink():
+                            walk_dirs.append(entry.path)
+                    except OSError:
+                        walk_dirs.append(entry.path)
+        except OSError:
+            pass
+
+        stack.append((root, dirs, files))
+        stack.extend((path, None, None) for path in reversed(walk_dirs))
+
+
+def get_entry_stat(entry):
+    """
+    Returns the stat of a directory entry, with its device and inode numbers.
+
+    `DirEntry.stat()` is usually served without a system call, but on Windows it
+    leaves `st_ino` and `st_dev` at zero. The nodes of the files, and with them the
+    cache keys, must tell the files apart, so the entry is stat'ed again then.
+
+    Args:
+        entry (os.DirEntry): The directory entry.
 
     Returns:
-        Either the original keys, if the length is less than or equal to 1000, or a hash of the keys if their count is more than 1000.
+        os.stat_result: The stat of the entry.
     """
-    # If there are more than 1000 keys, create a hash representation of them.
-    # `get_hash` is assumed to be a previously defined function.
-    return get_hash(keys) if len(keys) > 1000 else keys
+    st = entry.stat()
+    if not st.st_ino:
+        st = os.stat(entry.path)
+    return st
 
 
 def collect_data(dir_path, followlinks):
@@ -319,67 +613,89 @@ def collect_data(dir_path, followlinks):
     res_files = {}
     res_dirs = defaultdict(dict)
 
-    stat = os.stat(dir_path)
+    st = os.stat(dir_path)
 
-    # Initialize the result dictionaries with information about the root directory
-    res_dirs[dir_path] = {
+    # Information about the root directory itself
+    res_root_dir = {
         "path": dir_path,
         "root": None,
         "name": os.path.basename(dir_path),
         "size": 0,
         "flen": 0,
         "dlen": 0,
-        "keys": "",
+        "keys": b"",
         "base": dir_path,
-        "date": int(stat.st_mtime),
-        "node": str(stat.st_dev) + ":" + str(stat.st_ino),
+        "date": int(st.st_mtime),
+        "node": (st.st_dev << 64) | st.st_ino,
     }
 
-    # Use os.walk to traverse the directory tree
-    for root, dirs, files in os.walk(dir_path, followlinks=followlinks, topdown=False):
+    # Traverse the directory tree bottom-up, children before their parents
+    for root, dirs, files in walk_entries(dir_path, followlinks):
+        # Directory paths and names repeat across many records, so share
+        # a single string object for each of them
+        root = sys.intern(root)
+
         # TODO: More sort functions
-        files.sort(reverse=True)
-        dirs.sort(reverse=True)
+        files.sort(key=lambda entry: entry.name, reverse=True)
+        dirs.sort(key=lambda entry: entry.name, reverse=True)
 
-        for name in dirs:
-            path = os.path.join(root, name)
-            stat = os.stat(path)
+        # Sum up the children locally and update the root directory once
+        root_size = 0
+        root_flen = 0
+
+        for entry in dirs:
+            path = sys.intern(entry.path)
+            st = get_entry_stat(entry)
 
             res_dir = {
                 "path": path,
                 "root": root,
-                "name": name,
+                "name": sys.intern(entry.name),
                 "size": 0,
                 "flen": 0,
                 "dlen": 0,
-                "keys": "",
+                "keys": b"",
                 "base": dir_path,
-                "date": int(stat.st_mtime),
-                "node": str(stat.st_dev) + ":" + str(stat.st_ino),
+                "date": int(st.st_mtime),
+                "node": (st.st_dev << 64) | st.st_ino,
             }
             res_dir.update(res_dirs.get(path, {}))
             res_dirs[path] = res_dir
+            root_size += res_dir["size"]
 
-            res_dirs[root]["size"] = (
-                res_dirs[root].get("size", 0) + res_dirs[path]["size"]
-            )
-            res_dirs[root]["dlen"] = res_dirs[root].get("dlen", 0) + 1
-        for name in files:
-            path = os.path.join(root, name)
-            stat = os.stat(path)
-            size = stat.st_size
+        for entry in files:
+            try:
+                st = get_entry_stat(entry)
+            except OSError:
+                # Broken symbolic links and files removed during the scan
+                continue
+
+            path = entry.path
+            size = st.st_size
             res_files[path] = {
                 "path": path,
                 "root": root,
-                "name": name,
+                "name": sys.intern(entry.name),
                 "size": size,
-                "keys": "",
+                "keys": b"",
                 "base": dir_path,
-                "date": int(stat.st_mtime),
-                "node": str(stat.st_dev) + ":" + str(stat.st_ino),
+                "date": int(st.st_mtime),
+                # Device and inode packed into one integer for the cache keys
+                "node": (st.st_dev << 64) | st.st_ino,
+                "mtime": st.st_mtime_ns,
             }
-            res_dirs[root]["size"] = res_dirs[root].get("size", 0) + size
-            res_dirs[root]["flen"] = res_dirs[root].get("flen", 0) + 1
+            root_size += size
+            root_flen += 1
+
+        res_root = res_dirs[root]
+        res_root["size"] = res_root.get("size", 0) + root_size
+        res_root["dlen"] = res_root.get("dlen", 0) + len(dirs)
+        res_root["flen"] = res_root.get("flen", 0) + root_flen
+
+    # Add the root directory last, so that every directory comes after all of
+    # its subdirectories and the result can be processed children first
+    res_root_dir.update(res_dirs.pop(dir_path, {}))
+    res_dirs[dir_path] = res_root_dir
 
     # Stop timing the operation for benchmarking
     bench.stop()
@@ -406,7 +722,7 @@ def collect_all_data(dir_paths, followlinks):
     for dir_path in dir_paths:
         root = os.path.abspath(dir_path)
 
-        print(f"Collecting data for the directory: {dir_path}")
+        log(f"Collecting data for the directory: {dir_path}")
 
         # Collect data for the current directory path
         new_dirs, new_files = collect_data(root, followlinks)
@@ -419,14 +735,14 @@ def collect_all_data(dir_paths, followlinks):
         new_size = new_dirs[root]["size"]
         all_size += new_size
 
-        print(
+        log(
             f"Collected {len(new_dirs)} directories and {len(new_files)} files"
             + f" with a total size of {format_size(new_size)}\n"
         )
-        print(
+        log(
             f"Now have {len(res_dirs)} directories and {len(res_files)} files in total"
         )
-        print(f"Total size is {format_size(all_size)}\n")
+        log(f"Total size is {format_size(all_size)}\n")
 
     return res_dirs, res_files
 
@@ -439,21 +755,61 @@ def remove_unique(root, all_dirs, all_files, all_roots):
     Args:
         root (str): The root directory from which to start the deletion process.
     """
-    while True:
-        if not root or not root in all_dirs:
+    while root:
+        dir_info = all_dirs.pop(root, None)  # Delete the current root directory
+        if dir_info is None:
             break
 
         if params.dirs_only:
-            for path in all_roots[root]:
-                if path in all_files:  # If the path is in the list of all files
-                    del all_files[path]  # Delete the file
+            for path in all_roots.get(root, ()):
+                all_files.pop(path, None)  # Delete the file if it is still there
 
-        next_root = all_dirs[root]["root"]  # Get the root of the current root directory
-        del all_dirs[root]  # Delete the current root directory
-        root = next_root  # Update the root directory for the next iteration
+        root = dir_info["root"]  # Continue with the root of the current directory
 
 
-def get_duplicates(func, all_dirs, all_files, all_roots):
+def compute_keys(func, file_infos, prefetch=None, jobs=1):
+    """
+    Applies a comparison function to a list of files and yields the results in order.
+
+    When `jobs` is greater than 1, the function is run in a pool of threads. Reading and hashing
+    release the GIL, so several files are read and hashed at the same time. The number of
+    files in flight is bounded, so the memory used does not depend on the number of files.
+
+    Args:
+        func (function): A function that takes a file_info dictionary and returns a hashable value.
+        file_infos (list): A list of file_info dictionaries.
+        prefetch (function, optional): A function that takes a file_info dictionary and starts reading
+                                       the data `func` will need. It is called `PREFETCH_DEPTH` files ahead.
+        jobs (int, optional): The number of threads to use. Default is 1.
+
+    Yields:
+        The value returned by `func` for each file, in the order of `file_infos`.
+    """
+
+    if prefetch:
+        for file_info in file_infos[:PREFETCH_DEPTH]:
+            prefetch(file_info)
+
+    if jobs <= 1:
+        for index, file_info in enumerate(file_infos):
+            if prefetch and index + PREFETCH_DEPTH < len(file_infos):
+                prefetch(file_infos[index + PREFETCH_DEPTH])
+            yield func(file_info)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for index, file_info in enumerate(file_infos):
+            if prefetch and index + PREFETCH_DEPTH < len(file_infos):
+                prefetch(file_infos[index + PREFETCH_DEPTH])
+            pending.append(executor.submit(func, file_info))
+            if len(pending) >= jobs * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_duplicates(func, all_dirs, all_files, all_roots, prefetch=None, jobs=1):
     """
     Retrieve directories and files that are duplicates using a function for comparison.
 
@@ -461,10 +817,13 @@ def get_duplicates(func, all_dirs, all_files, all_roots):
     A dictionary is maintained to keep track of duplicates and the directories/files are updated accordingly.
 
     Args:
-        func (function): A function that takes a file_info dictionary and returns a hashable value.
+        func (function): A function that takes a file_info dictionary and returns a str, bytes or None.
+        prefetch (function, optional): A function that takes a file_info dictionary and starts reading
+                                       the data `func` will need. It is called `PREFETCH_DEPTH` files ahead.
+        jobs (int, optional): The number of threads used to compute the keys. Default is 1.
 
-    Returns:
-        tuple: Two dictionaries (dir_dups, file_dups) containing information about duplicate directories and files.
+    The keys of the remaining directories and files are updated in-place, so that after the last
+    call `get_dups_groups` can group them.
     """
 
     bench.start()
@@ -472,73 +831,116 @@ def get_duplicates(func, all_dirs, all_files, all_roots):
     # Initial count of directories and files
     dlen, flen = len(all_dirs), len(all_files)
 
-    dir_keys_paths = defaultdict(list)
-    file_keys_paths = defaultdict(list)
+    # Paths are only kept in lists for keys seen more than once, a key seen once
+    # keeps its single path in `file_once`
+    file_once = {}
+    file_keys_paths = {}
 
-    dir_dups = defaultdict(list)
-    file_dups = defaultdict(list)
-
-    # If not only searching for file duplicates, prepare directory keys
+    # If not only searching for file duplicates, prepare directory keys.
+    # Directory keys are accumulated in a hasher, so they have a fixed size
+    # regardless of the number of files and the depth of the tree.
     if not params.files_only:
-        for path, dir_info in all_dirs.items():
-            dir_info["keys"] = ":"
-            if check("dirname"):
-                dir_info["keys"] += dir_info["name"] + ":"
-            if check("dircount"):
-                dir_info["keys"] += str(dir_info["dlen"]) + ":"
-            if check("filecount"):
-                dir_info["keys"] += str(dir_info["flen"]) + ":"
+        check_dirname = check("dirname")
+        check_dircount = check("dircount")
+        check_filecount = check("filecount")
+
+        for dir_info in all_dirs.values():
+            hasher = new_hasher(b":")
+            if check_dirname:
+                hasher.update(dir_info["name"].encode(errors="surrogateescape") + b":")
+            if check_dircount:
+                hasher.update(str(dir_info["dlen"]).encode() + b":")
+            if check_filecount:
+                hasher.update(str(dir_info["flen"]).encode() + b":")
+            dir_info["keys"] = hasher
 
     # Prepare file keys
-    for path, file_info in all_files.items():
-        key = func(file_info)
-        file_info["keys"] = compact_keys(file_info["keys"] + str(key or ""))
-        file_keys_paths[file_info["keys"]].append(path)
-
-    # Handle unique files and update directory keys
-    for keys, paths in file_keys_paths.items():
-        if len(paths) == 1:
-            path = paths[0]
-            root = all_files.get(path, {}).get("root")
-            if root:
-                del all_files[path]
-                if not params.files_only:
-                    remove_unique(root, all_dirs, all_files, all_roots)
-        elif not params.files_only:
+    files = list(all_files.items())
+    new_keys = compute_keys(func, [file_info for _, file_info in files], prefetch, jobs)
+
+    for (path, file_info), key in zip(files, new_keys):
+        # Content hashes are raw digests already, other keys are strings
+        if isinstance(key, str):
+            key = key.encode(errors="surrogateescape")
+        keys = file_info["keys"] = get_hash(file_info["keys"] + (key or b""))
+        if keys in file_keys_paths:
+            file_keys_paths[keys].append(path)
+        elif keys in file_once:
+            file_keys_paths[keys] = [file_once.pop(keys), path]
+        else:
+            file_once[keys] = path
+
+    # Handle unique files
+    for path in file_once.values():
+        root = all_files.get(path, {}).get("root")
+        if root:
+            del all_files[path]
+            if not params.files_only:
+                remove_unique(root, all_dirs, all_files, all_roots)
+
+    # Update directory keys
+    if not params.files_only:
+        for keys, paths in file_keys_paths.items():
             for path in paths:
                 root = all_files.get(path, {}).get("root")
                 if root and root in all_dirs:
-                    all_dirs[root]["keys"] += ":" + keys
+                    all_dirs[root]["keys"].update(b":" + keys)
 
     # Handle directories
     if not params.files_only:
-        for path, dir_info in sorted(all_dirs.items(), reverse=True):
+        # Directories were collected children first, so every directory key
+        # is complete by the time it is finalized and added to its root. The
+        # keys of the subdirectories are combined in sorted order, so that
+        # the result does not depend on the order of the directory walk.
+        dirs_keys = defaultdict(list)
+        for path, dir_info in all_dirs.items():
+            hasher = dir_info["keys"]
+            for child_keys in sorted(dirs_keys.pop(path, ())):
+                hasher.update(b"/" + child_keys)
+            dir_info["keys"] = hasher.digest()
             root = dir_info["root"]
             if root and root in all_dirs:
-                keys = all_dirs[root]["keys"] + "/" + all_dirs[path]["keys"]
-                all_dirs[root]["keys"] = compact_keys(keys)
+                dirs_keys[root].append(dir_info["keys"])
 
+        dir_once = {}
+        dir_many = set()
         for path, dir_info in all_dirs.items():
-            dir_keys_paths[dir_info["keys"]].append(path)
-
-        for keys, paths in dir_keys_paths.items():
-            if len(paths) == 1:
-                remove_unique(paths[0], all_dirs, all_files, all_roots)
+            keys = dir_info["keys"]
+            if keys in dir_many:
+                continue
+            if keys in dir_once:
+                del dir_once[keys]
+                dir_many.add(keys)
             else:
-                for path in paths:
-                    if path in all_dirs:
-                        dir_dups[keys].append(all_dirs[path])
+                dir_once[keys] = path
 
-    # Prepare file duplicates
-    for keys, paths in file_keys_paths.items():
-        if len(paths) > 1:
-            for path in paths:
-                if path in all_files:
-                    file_dups[keys].append(all_files[path])
+        for path in dir_once.values():
+            remove_unique(path, all_dirs, all_files, all_roots)
 
     bench.stop()
-    print(f"{dlen - len(all_dirs)} dirs and {flen - len(all_files)} files removed")
-    print(f"{len(all_dirs)} dirs and {len(all_files)} files left\n")
+    log(f"{dlen - len(all_dirs)} dirs and {flen - len(all_files)} files removed")
+    log(f"{len(all_dirs)} dirs and {len(all_files)} files left\n")
+
+
+def get_dups_groups(all_dirs, all_files):
+    """
+    Group the directories and files left after the last `get_duplicates` call by their keys.
+
+    The groups are built once, after all the checks, instead of after every check.
+
+    Returns:
+        tuple: Two dictionaries (dir_dups, file_dups) containing information about duplicate directories and files.
+    """
+
+    dir_dups = defaultdict(list)
+    file_dups = defaultdict(list)
+
+    if not params.files_only:
+        for dir_info in all_dirs.values():
+            dir_dups[dir_info["keys"]].append(dir_info)
+
+    for file_info in all_files.values():
+        file_dups[file_info["keys"]].append(file_info)
 
     return dir_dups, file_dups
 
@@ -554,7 +956,8 @@ def get_all_duplicates(all_dirs, all_files, all_roots):
 
     This function applies these checks in order. For every check, it removes directories
     and files that are not duplicates according to that check. It uses the `get_duplicates`
-    and `get_file_hash` functions to perform these checks and get the duplicates.
+    and `get_file_hash` functions to perform these checks and `get_dups_groups` to get
+    the duplicates.
 
     The function also saves the cache after each operation that modifies it using the
     `cache.save` method.
@@ -567,62 +970,80 @@ def get_all_duplicates(all_dirs, all_files, all_roots):
         which are duplicates of each other.
     """
 
-    if check("filename") or check("size") or check("date"):
-        print(
+    # Files of different sizes can never have the same hash, so when hashes are
+    # compared, candidates are eliminated by size first without reading them.
+    check_filename = check("filename")
+    check_size = "size" if check("size") or check("hash") else ""
+    check_date = check("date")
+
+    # This pass also runs when no file contents are compared at all, so that
+    # directories still get their keys from the name and count checks.
+    check_contents = check("firstbytes") or check("lastbytes") or check("hash")
+
+    if check_filename or check_size or check_date or not check_contents:
+        log(
             "Now eliminating candidates based on "
-            + ", ".join(filter(None, map(check, ["filename", "size", "date"])))
+            + (
+                ", ".join(filter(None, [check_filename, check_size, check_date]))
+                or "directory structure"
+            )
             + "..."
         )
 
-        dir_dups, file_dups = get_duplicates(
-            lambda file: "<" + (str(file["name"]) + "/")
-            if check("filename")
-            else "" + (str(file["size"]) + "/")
-            if check("size")
-            else "" + (str(file["date"]) + "/")
-            if check("date")
-            else "" + ">",
+        get_duplicates(
+            lambda file: "<"
+            + (file["name"] + "/" if check_filename else "")
+            + (str(file["size"]) + "/" if check_size else "")
+            + (str(file["date"]) + "/" if check_date else "")
+            + ">",
             all_dirs,
             all_files,
             all_roots,
         )
 
-    if check("firstbytes"):
-        print("Now eliminating candidates based on first bytes...")
+    # The content checks, ordered by the amount of data they read. Each of them
+    # only reads the candidates left by the checks before it, but compares every
+    # file on its own, so that any of them can be checked without the others.
+    # The window of a file smaller than the chunk covers the whole file, so all
+    # the checks share its cached hash and it is read only once.
+    stages = [
+        (
+            "firstbytes",
+            "first bytes",
+            lambda file: get_file_hash(file, None, params.chunk),
+            lambda file: prefetch_file(file, None, params.chunk),
+        ),
+        (
+            "lastbytes",
+            "last bytes",
+            lambda file: get_file_hash(file, -params.chunk),
+            lambda file: prefetch_file(file, -params.chunk),
+        ),
+        (
+            "hash",
+            "hash",
+            lambda file: get_file_hash(file),
+            None,
+        ),
+    ]
+
+    for param, name, func, prefetch in stages:
+        if not check(param):
+            continue
 
-        dir_dups, file_dups = get_duplicates(
-            lambda file: get_file_hash(file, None, params.chunk)
-            if file["size"] > params.chunk
-            else get_file_hash(file),
-            all_dirs,
-            all_files,
-            all_roots,
-        )
-        cache.save()
+        if not all_files and (params.files_only or not all_dirs):
+            # Every candidate is eliminated already, there is nothing left to read.
+            # Directories are still passed through get_duplicates, as their keys
+            # are only assigned there.
+            break
 
-    if check("lastbytes"):
-        print("Now eliminating candidates based on last bytes...")
-        dir_dups, file_dups = get_duplicates(
-            lambda file: get_file_hash(file, -params.chunk)
-            if file["size"] > params.chunk * 2
-            else None,
-            all_dirs,
-            all_files,
-            all_roots,
-        )
+        log(f"Now eliminating candidates based on {name}...")
+        get_duplicates(func, all_dirs, all_files, all_roots, prefetch, params.jobs)
         cache.save()
 
-    if check("hash"):
-        print("Now eliminating candidates based on hash...")
-        dir_dups, file_dups = get_duplicates(
-            lambda file: get_file_hash(file) if file["size"] > params.chunk else None,
-            all_dirs,
-            all_files,
-            all_roots,
-        )
-        cache.save()
+    dir_dups, file_dups = get_dups_groups(all_dirs, all_files)
 
-    print(
+    log(
         f"Now have {len(dir_dups)} groups of duplicate directories and {len(file_dups)} groups of duplicate files"
     )
 
@@ -646,118 +1067,99 @@ def post_filter(rm_dirs, rm_files, all_dirs, all_files, all_roots):
         for dir_path in rm_dirs:
             del all_dirs[dir_path]
             if params.dirs_only:
-                for file_path in all_roots[dir_path]:
+                for file_path in all_roots.get(dir_path, ()):
                     rm_files[file_path] = True
 
     for file_path in rm_files:
         del all_files[file_path]
 
-    print(f"{len(rm_dirs)} dirs and {len(rm_files)} files removed")
-    print(f"{len(all_dirs)} dirs and {len(all_files)} files left\n")
+    log(f"{len(rm_dirs)} dirs and {len(rm_files)} files removed")
+    log(f"{len(all_dirs)} dirs and {len(all_files)} files left\n")
 
     return rm_dirs, rm_files
 
 
-def filter_empty(all_dirs, all_files, all_roots):
-    """
-    Filters out empty directories and/or files based on user preference.
-    If the 'include_empty_dirs' or 'include_empty_files' parameters are False, the function
-    goes through all directories and files and checks if they are empty.
-    If a directory or a file is empty, it is added to a list to be removed.
-
-    If the 'files_only' parameter is True, empty directories are not removed.
+def compile_patterns(patterns):
     """
+    Compiles a list of shell-style patterns into a single regular expression.
 
-    if params.include_empty_dirs and params.include_empty_files:
-        return
-
-    print("Now remove empty directories and/or files...")
-
-    rm_dirs, rm_files = {}, {}
+    Matching a path against the combined expression gives the same result as calling
+    `fnmatch.fnmatch` with each pattern in turn, but takes a single regex match per path.
 
-    if not params.files_only and not params.include_empty_dirs:
-        for dir_path, dir_info in all_dirs.items():
-            if dir_info["size"] < 1:
-                rm_dirs[dir_path] = True
-
-    if not params.include_empty_files:
-        for file_path, file_info in all_files.items():
-            if file_info["size"] < 1:
-                rm_files[file_path] = True
+    Parameters:
+    patterns (list): The shell-style patterns, such as "*.bak" or "/dir/**".
 
-    post_filter(rm_dirs, rm_files, all_dirs, all_files, all_roots)
+    Returns:
+    re.Pattern: The compiled expression, to be matched against normcase'd paths.
+    """
+    return re.compile(
+        "|".join(
+            "(?:" + fnmatch.translate(os.path.normcase(pattern)) + ")"
+            for pattern in patterns
+        )
+    )
 
 
-def filter_exclude(all_dirs, all_files, all_roots):
+def filter_all(all_dirs, all_files, all_roots):
     """
-    Filters out directories and/or files that match the specified exclude patterns.
-    The function first checks if there are any exclude patterns for directories or files.
-    If there are, it goes through all directories and files and checks if they match any of the exclude patterns.
-    If a directory or a file matches an exclude pattern, it is added to a list to be removed.
+    Filters out empty directories and/or files, files that don't fit within the specified minimum and
+    maximum file size if the files_only parameter is True, and directories and/or files that match the
+    specified exclude patterns.
 
-    If the 'files_only' parameter is True, directories are not checked against the exclude patterns.
+    All the filters are applied in a single pass over the directories and a single pass over the files.
+    A directory or a file rejected by any of the filters is added to a list to be removed.
+
+    If the 'files_only' parameter is True, directories are not checked at all.
     """
 
-    if not params.exclude_dirs and not params.exclude_files:
+    files_only = params.files_only
+    remove_empty_dirs = not files_only and not params.include_empty_dirs
+    remove_empty_files = not params.include_empty_files
+    check_file_size = files_only and (
+        params.min_file_size is not None or params.max_file_size is not None
+    )
+    exclude_dirs = params.exclude_dirs_pattern if not files_only else None
+    exclude_files = params.exclude_files_pattern
+
+    if not (
+        remove_empty_dirs
+        or remove_empty_files
+        or check_file_size
+        or exclude_dirs
+        or exclude_files
+    ):
         return
 
-    print(
-        "Now remove directories and/or files that do not match the exclude patterns..."
+    log("Now remove empty, excluded and/or out of size directories and files...")
+
+    min_file_size = params.min_file_size or 0
+    max_file_size = (
+        params.max_file_size if params.max_file_size is not None else float("inf")
     )
+    normcase = os.path.normcase
 
     rm_dirs, rm_files = {}, {}
 
-    if not params.files_only and params.exclude_dirs:
-        for dir_path, _ in all_dirs.items():
-            if any(
-                fnmatch.fnmatch(dir_path, pattern) for pattern in params.exclude_dirs
+    if remove_empty_dirs or exclude_dirs:
+        for dir_path, dir_info in all_dirs.items():
+            if (remove_empty_dirs and dir_info["size"] < 1) or (
+                exclude_dirs and exclude_dirs.match(normcase(dir_path))
             ):
                 rm_dirs[dir_path] = True
 
-    if params.exclude_files:
-        for file_path, _ in all_files.items():
-            if any(
-                fnmatch.fnmatch(file_path, pattern) for pattern in params.exclude_files
+    if remove_empty_files or check_file_size or exclude_files:
+        for file_path, file_info in all_files.items():
+            size = file_info["size"]
+            if (
+                (remove_empty_files and size < 1)
+                or (check_file_size and not min_file_size <= size <= max_file_size)
+                or (exclude_files and exclude_files.match(normcase(file_path)))
             ):
                 rm_files[file_path] = True
 
     post_filter(rm_dirs, rm_files, all_dirs, all_files, all_roots)
 
 
-def filter_files_only(all_files):
-    """
-    Filters out files that don't fit within the specified minimum and maximum file size if the files_only parameter is True.
-    Prints the number of files that are removed and the number of files that are left after the removal.
-
-    This function will do nothing if both the minimum and maximum file sizes are not specified.
-    """
-
-    if not params.files_only or (
-        params.min_file_size is None and params.max_file_size is None
-    ):
-        return
-
-    print("Now we are deleting files that exceed the allowed size...")
-
-    rm_files = {}
-
-    for file_path, file_info in all_files.items():
-        if (
-            params.min_file_size is not None
-            and params.min_file_size > file_info["size"]
-        ) or (
-            params.max_file_size is not None
-            and params.max_file_size < file_info["size"]
-        ):
-            rm_files[file_path] = True
-
-    for file_path in rm_files:
-        del all_files[file_path]
-
-    print(f"{len(rm_files)} files removed")
-    print(f"{len(all_files)} files left\n")
-
-
 def filter_subdirs(dir_dups, all_dirs):
     """
     Join duplicate directories based on their root keys.
@@ -811,9 +1213,18 @@ def get_roots(files):
     Returns:
         dict: A dictionary where keys are root directories and values are lists of files.
     """
-    roots = defaultdict(list)
+    roots = {}
+    last_root = paths = None
     for path, file in files.items():
-        roots[file["root"]].append(path)
+        root = file["root"]
+        # Files of a directory are collected one after another, so the list
+        # only has to be looked up when the directory changes
+        if root != last_root:
+            paths = roots.get(root)
+            if paths is None:
+                paths = roots[root] = []
+            last_root = root
+        paths.append(path)
 
     return roots
 
@@ -843,32 +1254,52 @@ def print_groups_summary(rm_len, left_len):
         left_len (int): The number of duplicate groups left after removal.
     """
 
-    print(f"{rm_len} groups removed, {left_len} left")
+    log(f"{rm_len} groups removed, {left_len} left")
 
 
-def filter_dups_groups(dups_groups, func):
+def filter_dups_groups_by_count(dups_groups, min_count):
     """
-    Filters duplicate groups (either file or directory) based on a given function.
+    Removes duplicate groups with fewer items than `min_count`.
 
     Args:
-        dups_groups (dict): A dictionary of duplicate groups. Each key is a tuple representing the group's attributes,
-                            and the corresponding value is a list of dictionaries, each representing an item
-                            (file or directory) in the group.
-        func (function): A function that takes a list of items (either files or directories) as input and returns a
-                         boolean. The function should return True for the groups that need to be removed.
+        dups_groups (dict): A dictionary of duplicate groups, each keyed by what its items have in common.
+        min_count (int): The minimum number of items in a group.
 
     Returns:
         to_remove (list): A list of keys of the groups that have been removed.
+    """
+
+    to_remove = [keys for keys, dups in dups_groups.items() if len(dups) < min_count]
+
+    for keys in to_remove:
+        del dups_groups[keys]
+
+    return to_remove
 
-    The function iterates over the groups in `dups_groups`. For each group, it applies `func` to the group's items.
-    If `func` returns True, the function adds the group's keys to `to_remove` and removes the group from `dups_groups`.
+
+def filter_dups_groups_by_size(dups_groups, min_size, max_size):
     """
+    Removes duplicate groups whose items are smaller than `min_size` or larger than `max_size`.
 
-    to_remove = []
+    Args:
+        dups_groups (dict): A dictionary of duplicate groups, each keyed by what its items have in common.
+        min_size (int): The minimum size of the items in bytes, or None for no limit.
+        max_size (int): The maximum size of the items in bytes, or None for no limit.
 
-    for keys, dups in dups_groups.items():
-        if func(dups):
-            to_remove.append(keys)
+    Returns:
+        to_remove (list): A list of keys of the groups that have been removed.
+    """
+
+    if min_size is None:
+        min_size = 0
+    if max_size is None:
+        max_size = float("inf")
+
+    to_remove = [
+        keys
+        for keys, dups in dups_groups.items()
+        if not min_size <= dups[0]["size"] <= max_size
+    ]
 
     for keys in to_remove:
         del dups_groups[keys]
@@ -906,42 +1337,27 @@ def filter_dir_dups_groups(dups_groups, all_dirs):
         return
 
     if not params.no_combine_dirs:
-        print("Compacting groups of directories...")
+        log("Compacting groups of directories...")
         removed = filter_subdirs(dups_groups, all_dirs)
         print_groups_summary(len(removed), len(dups_groups))
 
     if params.dups_dirs_count:
-        print("Filtering groups by dups count in group...")
-        removed = filter_dups_groups(
-            dups_groups, lambda dups: params.dups_dirs_count > len(dups)
-        )
+        log("Filtering groups by dups count in group...")
+        removed = filter_dups_groups_by_count(dups_groups, params.dups_dirs_count)
         print_groups_summary(len(removed), len(dups_groups))
 
     if params.min_dir_size is not None or params.max_dir_size is not None:
-        print("Filtering groups by min/max size...")
-        removed = filter_dups_groups(
-            dups_groups,
-            lambda dups: (
-                params.min_dir_size is not None
-                and params.min_dir_size > dups[0]["size"]
-            )
-            or (
-                params.max_dir_size is not None
-                and params.max_dir_size < dups[0]["size"]
-            ),
+        log("Filtering groups by min/max size...")
+        removed = filter_dups_groups_by_size(
+            dups_groups, params.min_dir_size, params.max_dir_size
         )
         print_groups_summary(len(removed), len(dups_groups))
 
     if not dups_groups:
         return
 
-    res_dups_groups = []
-
     # TODO: Implement `into` marker like in file_dups
-    for _, dups in dups_groups.items():
-        res_dups_groups.append(dups)
-
-    return res_dups_groups
+    return list(dups_groups.values())
 
 
 def filter_file_dups_groups(dups_groups, all_dirs):
@@ -971,12 +1387,9 @@ def filter_file_dups_groups(dups_groups, all_dirs):
     If `in_free` is empty and either `params.no_combine_files` is True or `params.files_only` is True,
     it removes the group of duplicates from `dups_groups`.
 
-    If `in_dirs` is not empty, it marks the first duplicate in the list as "into" (indicating it's the duplicate
-    to keep) and adds the rest of the duplicates in `in_dirs` to `dups_act` (a list representing duplicates to act upon),
-    also marked as "into". If `in_dirs` is empty, it does the same for `in_free`.
-
-    Finally, the function appends the list `[dup_save] + dups_act` (where `dup_save` is the duplicate to keep)
-    to `res_dups_groups` (the list of results), and returns this list.
+    Duplicates in `in_dirs` are marked as "into", those in `in_free` are not. The function appends the list
+    `in_dirs + in_free` to `res_dups_groups` (the list of results), so the duplicate to keep comes first and is
+    one found in a duplicate directory if there is any, and returns this list.
 
     The function prints the number of groups removed and the number of remaining groups at several stages of the filtering process.
     """
@@ -985,24 +1398,14 @@ def filter_file_dups_groups(dups_groups, all_dirs):
         return
 
     if params.dups_files_count:
-        print("Filtering file groups by dups count in group...")
-        removed = filter_dups_groups(
-            dups_groups, lambda dups: params.dups_files_count > len(dups)
-        )
+        log("Filtering file groups by dups count in group...")
+        removed = filter_dups_groups_by_count(dups_groups, params.dups_files_count)
         print_groups_summary(len(removed), len(dups_groups))
 
     if params.min_file_size is not None or params.max_file_size is not None:
-        print("Filtering file groups by min/max size...")
-        removed = filter_dups_groups(
-            dups_groups,
-            lambda dups: (
-                params.min_file_size is not None
-                and params.min_file_size > dups[0]["size"]
-            )
-            or (
-                params.max_file_size is not None
-                and params.max_file_size < dups[0]["size"]
-            ),
+        log("Filtering file groups by min/max size...")
+        removed = filter_dups_groups_by_size(
+            dups_groups, params.min_file_size, params.max_file_size
         )
         print_groups_summary(len(removed), len(dups_groups))
 
@@ -1012,47 +1415,34 @@ def filter_file_dups_groups(dups_groups, all_dirs):
     res_dups_groups = []
     to_remove = []
 
+    # `all_dirs` is a dict keyed by path, so checking a root is a single hash lookup
+    files_only = params.files_only
+    no_combine_files = params.no_combine_files
+
     for keys, dups in dups_groups.items():
         in_dirs = []
         in_free = []
-
-        if not params.files_only:
+        if not files_only:
             for dup in dups:
                 (in_dirs if dup["root"] in all_dirs else in_free).append(dup)
         else:
             in_free = dups
 
-        if not (in_free or params.no_combine_files or params.files_only):
+        if not (in_free or no_combine_files or files_only):
             to_remove.append(keys)
             continue
 
-        dup_save = None
-        dups_act = []
-
-        if in_dirs:
-            dup_save = in_dirs[0]
-            dup_save["into"] = True
-
-            for dup in in_dirs[1:]:
-                dup["into"] = True
-                dups_act.append(dup)
-
-        if dup_save:
-            for dup in in_free:
-                dup["into"] = False
-                dups_act.append(dup)
-        else:
-            dup_save = in_free[0]
-            dup_save["into"] = False
-
-            for dup in in_free[1:]:
-                dup["into"] = False
-                dups_act.append(dup)
+        for dup in in_dirs:
+            dup["into"] = True
+        for dup in in_free:
+            dup["into"] = False
 
-        res_dups_groups.append([dup_save] + dups_act)
+        # The first duplicate is the one to keep, preferably one found in a
+        # duplicate directory, so the group is built in its final order at once
+        res_dups_groups.append(in_dirs + in_free)
 
     if to_remove:
-        print("Processed files that are already present in duplicate directories")
+        log("Processed files that are already present in duplicate directories")
         print_groups_summary(len(to_remove), len(res_dups_groups))
 
     return res_dups_groups
@@ -1080,33 +1470,82 @@ def output_dups_groups(dups_groups, rel=False, is_dir=False):
     else:
         print("\nDuplicate files:\n")
 
+    join, basename, relpath = os.path.join, os.path.basename, os.path.relpath
+    write = sys.stdout.write
+
+    # Base names of the scanned directories, there are only a few of them
+    base_names = {}
+
     for num, dups in enumerate(dups_groups):
         dup = dups[0]
-        res = str(num + 1) + "  " if num is not None else ""
-        res += format_date(dup["date"]) + "  "
-        res += format_size(dup["size"]) + "  "
         if is_dir:
-            res += str(dup["dlen"]) + " directories  "
-            res += str(dup["flen"]) + " files  "
-        res += str(len(dups)) + " items"
-        print(res)
+            counts = f"{dup['dlen']} directories  {dup['flen']} files  "
+        else:
+            counts = ""
+        lines = [
+            f"{num + 1}  {format_date(dup['date'])}  {format_size(dup['size'])}  "
+            f"{counts}{len(dups)} items"
+        ]
 
         for i, dup in enumerate(dups):
-            res = "↳ " if dup.get("into", False) else "  "
+            # Only file groups mark the duplicates found in duplicate directories
+            res = "  " if is_dir else INTO_MARKS[dup["into"]]
             res += "✓ " if (i == 0) else "⨯ "
-            res += (
-                os.path.join(
-                    os.path.basename(dup["base"]),
-                    os.path.relpath(dup["path"], dup["base"]),
-                )
-                if rel
-                else dup["path"]
-            )
+            if rel:
+                base, path = dup["base"], dup["path"]
+                if base not in base_names:
+                    base_names[base] = basename(base)
+                # Paths lie under their base, so the relative part is just a slice
+                if path.startswith(base + os.sep):
+                    res += join(base_names[base], path[len(base) + 1 :])
+                else:
+                    res += join(base_names[base], relpath(path, base))
+            else:
+                res += dup["path"]
             res += "/" if is_dir else ""
-            print(res)
+            lines.append(res)
+
+        # Write the whole group at once instead of a print call per line
+        lines.append("")
+        write("\n".join(lines))
 
 
-def action_dups_groups(dups_groups):
+def action_dups_group(dups):
+    """
+    Performs the action specified in the command line parameters on a single group of duplicates.
+    The first item of the group is kept, all the others are removed and, if requested,
+    replaced with symbolic or hard links to the kept one.
+
+    Args:
+        dups (list): A list of dictionaries, each representing a file or directory with its attributes.
+
+    Returns:
+        list: The paths of the group that could not be found, for the caller to report.
+    """
+
+    invalid_paths = []
+    dup_save = dups[0]
+    for dup in dups[1:]:
+        # A single lstat tells a directory from a file or a symbolic link
+        try:
+            mode = os.lstat(dup["path"]).st_mode
+        except OSError:
+            invalid_paths.append(dup["path"])
+        else:
+            if stat.S_ISDIR(mode):
+                shutil.rmtree(dup["path"])
+            else:
+                os.remove(dup["path"])
+
+        if params.symlink:
+            os.symlink(dup_save["path"], dup["path"])
+        elif params.hardlink:
+            os.link(dup_save["path"], dup["path"])
+
+    return invalid_paths
+
+
+def action_dups_groups(dups_groups, jobs=1):
     """
     Performs actions on duplicate groups based on the command line parameters.
     If the script is set to delete duplicates, it removes duplicate files and directories.
@@ -1115,6 +1554,8 @@ def action_dups_groups(dups_groups):
     Args:
         dups_groups (list): A list of duplicate groups. Each group is a list of dictionaries,
                             where each dictionary represents a file or directory with its attributes.
+        jobs (int, optional): The number of threads acting on the groups. Only use more than one
+                              when the groups can not contain each other's paths. Default is 1.
 
     Returns:
         bool: True if the operation was successful, False otherwise.
@@ -1124,20 +1565,32 @@ def action_dups_groups(dups_groups):
     if not dups_groups or not (params.symlink or params.hardlink or params.delete):
         return False
 
-    for dups in dups_groups:
-        dup_save = dups[0]
-        for dup in dups[1:]:
-            if os.path.isfile(dup["path"]):
-                os.remove(dup["path"])
-            elif os.path.isdir(dup["path"]):
-                shutil.rmtree(dup["path"])
-            else:
-                print("Invalid path:", dup["path"])
-
-            if params.symlink:
-                os.symlink(dup_save["path"], dup["path"])
-            elif params.hardlink:
-                os.link(dup_save["path"], dup["path"])
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(action_dups_group, dups) for dups in dups_groups]
+            # Stop at the first error, as the sequential loop does. The groups
+            # already being processed are finished, the others are not started.
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                future.cancel()
+
+        # Report from this thread and in the order of the groups, so that the
+        # messages of different threads are not interleaved
+        error = None
+        for future in futures:
+            if future.cancelled():
+                continue
+            if future.exception():
+                error = error or future.exception()
+                continue
+            for path in future.result():
+                print("Invalid path:", path)
+        if error:
+            raise error
+    else:
+        for dups in dups_groups:
+            for path in action_dups_group(dups):
+                print("Invalid path:", path)
 
     return True
 
@@ -1177,6 +1630,13 @@ def get_params():
         default=65536,
         help="Size of the chunk to check in bytes (default: 65536 bytes)",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=min(32, (os.cpu_count() or 1) + 4),
+        help="Number of threads used to read and hash files and act on duplicate files (default: CPU count + 4, up to 32)",
+    )
     parser.add_argument(
         "--no-cache",
         action="store_true",
@@ -1372,6 +1832,13 @@ def get_params():
         help="Display relative paths of directories and files",
     )
 
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        action="store_true",
+        help="Do not display progress messages, only the duplicates found",
+    )
+
     args = parser.parse_args()
 
     if args.check:
@@ -1379,47 +1846,21 @@ def get_params():
     else:
         args.check = set(["data"])
 
-    if "epic" in args.check:
-        args.check.add("date")
-        args.check.add("full")
-    if "full" in args.check:
-        args.check.add("name")
-        args.check.add("data")
-    if "data" in args.check:
-        args.check.add("size")
-        args.check.add("bytes")
-        args.check.add("count")
-        args.check.add("hash")
-
-    if "fast" in args.check:
-        args.check.add("size")
-        args.check.add("tree")
-    if "tree" in args.check:
-        args.check.add("name")
-        args.check.add("count")
-
-    if "name" in args.check:
-        args.check.add("dirname")
-        args.check.add("filename")
-    if "bytes" in args.check:
-        args.check.add("firstbytes")
-        args.check.add("lastbytes")
-    if "count" in args.check:
-        args.check.add("dircount")
-        args.check.add("filecount")
+    # Expand the presets until nothing changes, presets can include other presets
+    changed = True
+    while changed:
+        changed = False
+        for preset, expansion in CHECK_PRESETS.items():
+            if preset in args.check and not expansion <= args.check:
+                args.check |= expansion
+                changed = True
 
     if args.ignore:
         args.ignore = set(args.ignore.lower().split(","))
 
-        if "name" in args.ignore:
-            args.check.discard("dirname")
-            args.check.discard("filename")
-        if "bytes" in args.ignore:
-            args.check.discard("firstbytes")
-            args.check.discard("lastbytes")
-        if "count" in args.ignore:
-            args.check.discard("dircount")
-            args.check.discard("filecount")
+        for group in ("name", "bytes", "count"):
+            if group in args.ignore:
+                args.check -= CHECK_PRESETS[group]
 
         args.check = args.check - args.ignore
 
@@ -1455,6 +1896,14 @@ def get_params():
         args.exclude_files = args.exclude_files or []
         args.exclude_files.extend(args.exclude)
 
+    # Compile the exclude patterns once, each list into a single expression
+    args.exclude_dirs_pattern = (
+        compile_patterns(args.exclude_dirs) if args.exclude_dirs else None
+    )
+    args.exclude_files_pattern = (
+        compile_patterns(args.exclude_files) if args.exclude_files else None
+    )
+
     return args
 
 
@@ -1466,20 +1915,32 @@ def main():
     directories/files should be excluded and if it should be in brief mode or not.
     """
 
-    if not params.reset_cache:
+    if params.reset_cache:
+        cache.reset()
+    else:
         cache.load()
 
     all_dirs, all_files = collect_all_data(params.directories, params.follow_links)
     all_roots = get_roots(all_files)
 
-    filter_empty(all_dirs, all_files, all_roots)
-    filter_files_only(all_files)
-    filter_exclude(all_dirs, all_files, all_roots)
+    # The files are eliminated as the search goes on, remember all of them to
+    # drop the cached hashes of those changed since they were hashed
+    scanned = {}
+    if cache.enabled:
+        scanned = {
+            file_info["node"]: (file_info["size"], file_info["mtime"])
+            for file_info in all_files.values()
+        }
+
+    filter_all(all_dirs, all_files, all_roots)
 
     dir_dups_groups, file_dups_groups = get_all_duplicates(
         all_dirs, all_files, all_roots
     )
 
+    cache.prune(scanned)
+    cache.save()
+
     if not params.files_only:
         res_dir_dups_groups = filter_dir_dups_groups(dir_dups_groups, all_dirs)
 
@@ -1497,12 +1958,15 @@ def main():
         output_dups_groups(
             res_file_dups_groups, rel=params.relative_paths, is_dir=False
         )
-        action_dups_groups(res_file_dups_groups)
+        # Files of different groups never contain each other, so the groups are
+        # independent and can be processed in parallel, unlike nested directories
+        action_dups_groups(res_file_dups_groups, params.jobs)
 
 
 state = {}
 params = get_params()
 bench = Bench(params.bench)
-cache = Cache("dup.py.cache.pkl", not params.no_cache)
+# The version in the name changes whenever the format of the cached values does
+cache = Cache("dup.py.cache.2.pkl", not params.no_cache)
 
 main()
@@ -0,0 +1,159 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+
+DUP_PY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dup.py"
+)
+
+
+def run_dup(*args, cache_dir=None):
+    """
+    Runs dup.py with the given arguments and returns the completed process.
+    The cache is disabled, unless `cache_dir` is given to keep it in.
+    """
+    env = None
+    if cache_dir is None:
+        args += ("--no-cache",)
+    else:
+        env = dict(os.environ, TMPDIR=cache_dir)
+    return subprocess.run(
+        [sys.executable, DUP_PY, *args, "--quiet"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+
+
+def write_files(dir_path, files):
+    """
+    Creates files in `dir_path` from a dictionary of names and contents.
+    """
+    for name, data in files.items():
+        with open(os.path.join(dir_path, name), "wb") as file:
+            file.write(data)
+
+
+class TestSmallFiles(unittest.TestCase):
+    """
+    Files no larger than --chunk must still be compared by content.
+    """
+
+    def test_check_hash_keeps_different_files(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            write_files(dir_path, {"x": b"hello", "y": b"world"})
+            run_dup(dir_path, "--check", "hash", "--delete")
+            self.assertEqual(sorted(os.listdir(dir_path)), ["x", "y"])
+
+    def test_ignore_bytes_keeps_different_files(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            write_files(dir_path, {"x": b"hello", "y": b"world"})
+            run_dup(dir_path, "--ignore", "bytes", "--delete")
+            self.assertEqual(sorted(os.listdir(dir_path)), ["x", "y"])
+
+    def test_check_lastbytes_keeps_different_files(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            write_files(dir_path, {"x": b"hello", "y": b"world"})
+            run_dup(dir_path, "--check", "lastbytes", "--delete")
+            self.assertEqual(sorted(os.listdir(dir_path)), ["x", "y"])
+
+    def test_check_hash_finds_equal_files(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            write_files(dir_path, {"x": b"hello", "y": b"hello"})
+            run_dup(dir_path, "--check", "hash", "--delete")
+            self.assertEqual(len(os.listdir(dir_path)), 1)
+
+
+class TestDirectoryKeys(unittest.TestCase):
+    """
+    Directories must get their keys even when no file reaches the content checks.
+    """
+
+    def test_scanned_root_is_kept_without_files(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            os.makedirs(os.path.join(dir_path, "q"))
+            os.makedirs(os.path.join(dir_path, "r", "k"))
+            write_files(os.path.join(dir_path, "q"), {"f": b"x"})
+            write_files(os.path.join(dir_path, "r", "k"), {"g": b"y"})
+            args = ["--check", "lastbytes,dircount", "--exclude-files", "*"]
+            run_dup(dir_path, *args, "--delete")
+            self.assertEqual(sorted(os.listdir(dir_path)), ["q", "r"])
+            self.assertEqual(os.listdir(os.path.join(dir_path, "r")), [])
+
+    def test_empty_dirs_grouped_by_dircount(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            os.makedirs(os.path.join(dir_path, "a", "c"))
+            os.makedirs(os.path.join(dir_path, "b", "d"))
+            args = ["--check", "bytes,dircount", "--include-empty-dirs"]
+            output = run_dup(dir_path, *args).stdout
+            self.assertIn("2 items", output)
+            self.assertNotIn(dir_path + "/\n", output)
+
+
+class TestCache(unittest.TestCase):
+    """
+    Cached hashes must follow changes of the files.
+    """
+
+    def test_changed_file_is_hashed_again(self):
+        with tempfile.TemporaryDirectory() as dir_path, tempfile.TemporaryDirectory() as cache_dir:
+            write_files(dir_path, {"x": b"hello", "y": b"hello"})
+            output = run_dup(dir_path, cache_dir=cache_dir).stdout
+            self.assertIn("2 items", output)
+
+            path = os.path.join(dir_path, "y")
+            mtime_ns = os.stat(path).st_mtime_ns
+            write_files(dir_path, {"y": b"world"})
+            os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+            output = run_dup(dir_path, cache_dir=cache_dir).stdout
+            self.assertNotIn("2 items", output)
+
+            # The hash of the old contents of "y" is dropped from the cache
+            cache_file = os.path.join(cache_dir, "dup.py.cache.2.pkl")
+            with open(cache_file, "rb") as file:
+                self.assertEqual(len(pickle.load(file)), 2)
+
+
+class TestParams(unittest.TestCase):
+    """
+    Command line parameters.
+    """
+
+    def test_size_without_unit(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            write_files(dir_path, {"small_1": b"s" * 50, "small_2": b"s" * 50})
+            write_files(dir_path, {"large_1": b"l" * 150, "large_2": b"l" * 150})
+            output = run_dup(dir_path, "--min-size", "100").stdout
+            self.assertIn("large_1", output)
+            self.assertNotIn("small_1", output)
+
+    def test_check_filename_size_date(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            for name in ("a", "b", "c"):
+                os.mkdir(os.path.join(dir_path, name))
+                write_files(os.path.join(dir_path, name), {"f": name.encode()})
+            os.utime(os.path.join(dir_path, "a", "f"), (10**9, 10**9))
+            os.utime(os.path.join(dir_path, "b", "f"), (10**9, 10**9))
+            os.utime(os.path.join(dir_path, "c", "f"), (2 * 10**9, 2 * 10**9))
+            output = run_dup(
+                dir_path, "--files-only", "--check", "filename,size,date"
+            ).stdout
+            self.assertIn("2 items", output)
+            self.assertIn(os.path.join(dir_path, "a", "f"), output)
+            self.assertNotIn(os.path.join(dir_path, "c", "f"), output)
+
+    def test_check_dircount(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            for name in ("a", "b"):
+                os.makedirs(os.path.join(dir_path, name, "sub"))
+                write_files(os.path.join(dir_path, name, "sub"), {"f": b"data"})
+            output = run_dup(dir_path, "--check", "dircount").stdout
+            self.assertIn("Duplicate directories", output)
+
+
+if __name__ == "__main__":
+    unittest.main()